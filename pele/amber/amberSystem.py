@@ -25,32 +25,60 @@ BaseSystem
 import tempfile
 import os
 import shutil
+import StringIO
+import multiprocessing as mp
 
 import numpy as np
 
 
 # pele  
 from pele.systems import BaseSystem
-from pele.mindist import ExactMatchAtomicCluster, MinPermDistAtomicCluster
+from pele.mindist import ExactMatchAtomicCluster, MinPermDistAtomicCluster, CoMToOrigin
 from pele.transition_states import orthogopt
 from pele.landscape import smooth_path
 from pele.systems import BaseParameters
 from pele.utils.elements import elements
 from pele.systems.spawn_OPTIM import SpawnOPTIM
-
-from read_amber import parse_topology_file
+from pele.systems._opengl_tools import change_color
+from pele.takestep import RandomDisplacement, AdaptiveStepsizeTemperature
+
+from read_amber import parse_topology_file, read_amber_coords
+from torsions import torsion_angles_from_indices, fallback_gather_indices, is_cis, is_D_chiral
+
+# optional dependencies: OpenGL is only needed for drawing and OpenMM only
+# for writing pdb files.  pymol is imported where it is used, so that e.g.
+# basinhopping can be run without installing it
+try:
+    from OpenGL import GL, GLU, GLUT, contextdata
+except ImportError:
+    pass
+
+try:
+    from simtk.openmm.app import pdbfile as openmmpdb
+    from simtk.unit import angstrom as openmm_angstrom
+except ImportError:
+    pass
 
 __all__ = ["AMBERSystem"]
 
+# key of the OpenGL display lists used by AMBERSystem.draw in the OpenGL context data
+_DISPLAY_LISTS_KEY = "pele.amber.amberSystem.display_lists"
+
 
 class AMBERSystem(BaseSystem):
-    def __init__(self, prmtopFname, inpcrdFname):
+    def __init__(self, prmtopFname, inpcrdFname, platform="fastest"):
         super(AMBERSystem, self).__init__()
 
         self.prmtopFname = prmtopFname
         self.inpcrdFname = inpcrdFname
+        # OpenMM platform used if the potential is set up with OpenMM
+        self.platform = platform
         self.parse_prmtop()
 
+        # the permlist and mindist are fixed for the system, so they are constructed once
+        self._permlist = None
+        self._mindist = None
+
         # self.potential = self.get_potential()
 
         self.set_params(self.params)
@@ -68,10 +96,13 @@ class AMBERSystem(BaseSystem):
         self.sanitycheck = False
 
         if self.sanitycheck:
-            #            self.params.basinhopping.confCheck = [self.check_cistrans_wrapper, self.check_CAchirality_wrapper]
-            self.params.basinhopping.confCheck = [self.check_CAchirality_wrapper]
-            self.params.double_ended_connect.conf_checks = [self.check_cistrans_wrapper_kwargs,
-                                                            self.check_CAchirality_wrapper_kwargs]
+            self.populate_peptideAtomList()
+            self.populate_CAneighborList()
+            # check the peptide bonds and CA chirality in a single pass over the coordinates.
+            # There is nothing to check e.g. for systems without amino acids
+            if self._has_pb or self._has_ca:
+                self.params.basinhopping.confCheck = [self.check_sanity_wrapper]
+                self.params.double_ended_connect.conf_checks = [self.check_sanity_wrapper_kwargs]
 
     def parse_prmtop(self):
         self.prmtop_parsed = parse_topology_file(self.prmtopFname)
@@ -80,6 +111,20 @@ class AMBERSystem(BaseSystem):
         self.atom_names = [a.element for a in atoms]
         self.bonds = [(a1.index, a2.index) for a1, a2 in
                       self.prmtop_parsed.atoms.edges_iter()]
+        self._freeze_topology(atoms)
+
+    def _freeze_topology(self, atoms):
+        """store the topology as numpy arrays so it never has to be iterated again
+
+        atoms is the list of parsed atoms sorted by index
+        """
+        # atom names from the prmtop ("CA", "CB", ...). Note that self.atom_names holds the elements
+        self._atom_labels = np.array([a.name for a in atoms])
+        self._bond_arr = np.array(self.bonds, dtype=np.intp).reshape(-1, 2)
+
+        # how the atoms are drawn
+        self._atom_colors = np.array([elements[e]['color'] for e in self.atom_names], dtype=np.float32)
+        self._atom_radii = np.array([elements[e]['radius'] / 5. for e in self.atom_names], dtype=np.float32)
 
     # def get_minimizer(self, **kwargs):
     # """return a function to minimize the structure"""
@@ -169,7 +214,8 @@ class AMBERSystem(BaseSystem):
         try:
             import openmm_potential
 
-            self.potential = openmm_potential.OpenMMAmberPotential(self.prmtopFname, self.inpcrdFname)
+            self.potential = openmm_potential.OpenMMAmberPotential(self.prmtopFname, self.inpcrdFname,
+                                                                   platform=self.platform)
             print '\namberSystem> Using OpenMM amber potential ..'
 
             # check for openmm version
@@ -193,11 +239,9 @@ class AMBERSystem(BaseSystem):
         """ returns a 1-D numpy array of length 3xNatoms """
 
         # using pele.amber.read_amber and inpcrd
-        from pele.amber.read_amber import read_amber_coords
-
         coords = read_amber_coords(self.inpcrdFname)
         print "amberSystem> Number of coordinates:", len(coords)
-        coords = np.reshape(np.transpose(coords), len(coords), 1)
+        coords = np.array(coords, dtype=np.float64).reshape(-1)
 
         # -- OpenMM
         # from simtk.unit import angstrom as openmm_angstrom 
@@ -206,13 +250,13 @@ class AMBERSystem(BaseSystem):
         # from simtk.openmm.app import pdbfile as openmmpdbReader
         # pdb = openmmpdbReader.PDBFile('coords.pdb')  # todo: coords.pdb is hardcoded
         # coords = pdb.getPositions() / openmm_angstrom
-        # coords = np.reshape(np.transpose(coords), 3*len(coords),1 )
+        # coords = np.asarray(coords, dtype=np.float64).reshape(-1)
 
         ##  using input inpcrd 
         # from simtk.openmm.app import AmberInpcrdFile
         # inpcrd = AmberInpcrdFile( self.inpcrdFname )   
         # coords = inpcrd.getPositions() / openmm_angstrom
-        # coords = np.reshape(np.transpose(coords), 3*len(coords),1 )
+        # coords = np.asarray(coords, dtype=np.float64).reshape(-1)
 
         return coords
 
@@ -225,15 +269,21 @@ class AMBERSystem(BaseSystem):
         massMatrix_tmp = np.identity(coords.size)
 
         # get masses from 'elements' file   
-        for i in self.potential.prmtop.topology.atoms():
-            atomNum = i.index
-            atomElem = i.name[0]  # assuming elements corresponding to first character of atom name
+        for atomNum, atomElem in enumerate(self.atom_names):
             m = elements[atomElem]['mass']
             massMatrix_tmp[atomNum][atomNum] = 1 / m
 
         return massMatrix_tmp
 
     def get_permlist(self):
+        """return the groups of permutable atoms
+
+        the permlist is constructed from coordsModTerm.pdb on the first call
+        and cached for the lifetime of the system
+        """
+        if self._permlist is not None:
+            return self._permlist
+
         import pdb2permlist
 
         # return [[0, 2, 3], [11, 12, 13], [19, 20, 21]  ] # aladipep 
@@ -248,17 +298,20 @@ class AMBERSystem(BaseSystem):
             print '\namberSystem> Groups of permutable atoms (atom numbers start at 0) = '
             for i in plist:
                 print i
-
-            return plist
         else:
             print 'amberSystem> coordsModTerm.pdb not found. permlist could not be created.'
-            return []
+            plist = []
+
+        self._permlist = plist
+        return self._permlist
 
 
     def get_mindist(self):
-        permlist = self.get_permlist()
+        if self._mindist is None:
+            permlist = self.get_permlist()
+            self._mindist = MinPermDistAtomicCluster(permlist=permlist, niter=10, can_invert=False)
 
-        return MinPermDistAtomicCluster(permlist=permlist, niter=10, can_invert=False)
+        return self._mindist
 
     def get_orthogonalize_to_zero_eigenvectors(self):
         return orthogopt
@@ -271,9 +324,33 @@ class AMBERSystem(BaseSystem):
         mindist = self.get_mindist()
         return smooth_path(path, mindist, **kwargs)
 
-    def drawCylinder(self, X1, X2):
-        from OpenGL import GL, GLU
+    def _get_display_lists(self):
+        """return the display lists of a unit sphere and of a bond cylinder of unit length along +z
 
+        the display lists are compiled on first use.  They belong to an OpenGL
+        context, so they are stored per context.
+        """
+        lists = contextdata.getValue(_DISPLAY_LISTS_KEY)
+        if lists is not None:
+            return lists
+
+        sphere_dl = GL.glGenLists(1)
+        GL.glNewList(sphere_dl, GL.GL_COMPILE)
+        GLUT.glutSolidSphere(1., 12, 12)
+        GL.glEndList()
+
+        cylinder_dl = GL.glGenLists(1)
+        GL.glNewList(cylinder_dl, GL.GL_COMPILE)
+        g = GLU.gluNewQuadric()
+        GLU.gluCylinder(g, .1, 0.1, 1., 12, 1)
+        GLU.gluDeleteQuadric(g)
+        GL.glEndList()
+
+        lists = (sphere_dl, cylinder_dl)
+        contextdata.setValue(_DISPLAY_LISTS_KEY, lists)
+        return lists
+
+    def drawCylinder(self, X1, X2):
         z = np.array([0., 0., 1.])  # default cylinder orientation
         p = X2 - X1  # desired cylinder orientation
         r = np.linalg.norm(p)
@@ -283,32 +360,45 @@ class AMBERSystem(BaseSystem):
         GL.glPushMatrix()
         GL.glTranslate(X1[0], X1[1], X1[2])
         GL.glRotate(a, t[0], t[1], t[2])
-        g = GLU.gluNewQuadric()
-        GLU.gluCylinder(g, .1, 0.1, r, 30, 30)  # I can't seem to draw a cylinder
+        GL.glScalef(1., 1., r)
+        GL.glCallList(self._get_display_lists()[1])
         GL.glPopMatrix()
 
     def draw(self, coordsl, index):
-        from pele.systems._opengl_tools import draw_sphere
+        sphere_dl, cylinder_dl = self._get_display_lists()
 
         coords = coordsl.reshape([-1, 3])
-        com = np.mean(coords, axis=0)
+        coords = coords - coords.mean(axis=0)
 
         # draw atoms as spheres      
-        for i, name in enumerate(self.atom_names):  # in self.potential.prmtop.topology.atoms():
-            x = coords[i, :] - com
-            col = elements[name]['color']
+        for i in xrange(len(self.atom_names)):
+            x = coords[i]
             if index == 2:
                 col = [0.5, 1.0, .5]
-            rad = elements[name]['radius'] / 5
-            draw_sphere(x, radius=rad, color=col)
-
-        # draw bonds  
-        for atomPairs in self.bonds:  # self.potential.prmtop.topology.bonds():
-            # note that atom numbers in topology start at 0
-            xyz1 = coords[atomPairs[0]] - com
-            xyz2 = coords[atomPairs[1]] - com
-
-            self.drawCylinder(xyz1, xyz2)
+            else:
+                col = self._atom_colors[i]
+            rad = self._atom_radii[i]
+            change_color(col)
+            GL.glPushMatrix()
+            GL.glTranslate(x[0], x[1], x[2])
+            GL.glScalef(rad, rad, rad)
+            GL.glCallList(sphere_dl)
+            GL.glPopMatrix()
+
+        # draw bonds.  The geometry of all the cylinders is computed at once,
+        # as in drawCylinder: rotate the z axis onto the bond vector
+        start = coords[self._bond_arr[:, 0]]
+        vecs = coords[self._bond_arr[:, 1]] - start
+        lengths = np.sqrt((vecs * vecs).sum(-1))
+        angles = np.degrees(np.arccos(np.clip(vecs[:, 2] / lengths, -1., 1.)))
+        axes = np.cross(np.array([0., 0., 1.]), vecs)
+        for k in xrange(len(self._bond_arr)):
+            GL.glPushMatrix()
+            GL.glTranslate(start[k, 0], start[k, 1], start[k, 2])
+            GL.glRotate(angles[k], axes[k, 0], axes[k, 1], axes[k, 2])
+            GL.glScalef(1., 1., lengths[k])
+            GL.glCallList(cylinder_dl)
+            GL.glPopMatrix()
 
 
     def load_coords_pymol(self, coordslist, oname, index=1):
@@ -335,31 +425,28 @@ class AMBERSystem(BaseSystem):
         # pymol is imported here so you can do, e.g. basinhopping without installing pymol
         import pymol
 
-        # create the temporary file
-        suffix = ".pdb"
-        f = tempfile.NamedTemporaryFile(mode="w", suffix=suffix)
-        fname = f.name
-
-        from simtk.openmm.app import pdbfile as openmmpdb
-
-        # write the coords into pdb file
-        from pele.mindist import CoMToOrigin
-
-        ct = 0
-        for coords in coordslist:
-            ct += 1
+        # write all the coords as models of a single pdb in memory
+        topology = self.potential.prmtop.topology
+        buf = StringIO.StringIO()
+        openmmpdb.PDBFile.writeHeader(topology, file=buf)
+        for ct, coords in enumerate(coordslist, 1):
             coords = CoMToOrigin(coords.copy())
             self.potential.copyToLocalCoords(coords)
-            from simtk.unit import angstrom as openmm_angstrom
-            #            openmmpdb.PDBFile.writeFile(self.potential.prmtop.topology , self.potential.localCoords * openmm_angstrom , file=sys.stdout, modelIndex=1)
-            openmmpdb.PDBFile.writeModel(self.potential.prmtop.topology, self.potential.localCoords * openmm_angstrom,
-                                         file=f, modelIndex=ct)
+            openmmpdb.PDBFile.writeModel(topology, self.potential.localCoords * openmm_angstrom,
+                                         file=buf, modelIndex=ct)
+        openmmpdb.PDBFile.writeFooter(topology, file=buf)
 
-        print "closing file"
-        f.flush()
+        # dump it to a temporary file in one write.  The file is closed before
+        # pymol reads it, since it can't always be reopened while still open
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".pdb", delete=False) as f:
+            f.write(buf.getvalue())
+            fname = f.name
 
         # load the molecule from the temporary file
-        pymol.cmd.load(fname)
+        try:
+            pymol.cmd.load(fname)
+        finally:
+            os.unlink(fname)
 
         # get name of the object just created and change it to oname
         objects = pymol.cmd.get_object_list()
@@ -377,7 +464,6 @@ class AMBERSystem(BaseSystem):
     #            pymol.cmd.color("blue", oname)
 
     def get_optim_spawner(self, coords1, coords2):
-        import os
         from pele.config import config
 
         optim = config.get("exec", "AMBOPTIM")
@@ -386,77 +472,81 @@ class AMBERSystem(BaseSystem):
         return AmberSpawnOPTIM(coords1, coords2, self, OPTIM=optim, tempdir=False)
 
 
+    def _atoms_named(self, name):
+        """return the atom numbers of all atoms called name"""
+        return np.where(self._atom_labels == name)[0]
+
+    def _build_bond_csr(self):
+        """store the bonds as a compressed sparse row adjacency structure
+
+        the atoms bonded to atom i are self._bond_indices[self._bond_indptr[i]:self._bond_indptr[i + 1]]
+        """
+        natoms = len(self.atom_names)
+        bonds = self._bond_arr
+        # every bond appears once for each of its two atoms
+        src = np.concatenate((bonds[:, 0], bonds[:, 1]))
+        dst = np.concatenate((bonds[:, 1], bonds[:, 0]))
+        order = np.argsort(src, kind="mergesort")
+        self._bond_indptr = np.concatenate(([0], np.bincount(src, minlength=natoms).cumsum())).astype(np.intp)
+        self._bond_indices = dst[order]
+
     def populate_peptideAtomList(self):
-        listofC = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "C"]
-        listofO = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "O"]
-        listofN = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "N"]
-        listofH = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "H"]
+        listofC = self._atoms_named("C")
+        setO = set(self._atoms_named("O").tolist())
+        setN = set(self._atoms_named("N").tolist())
+        setH = set(self._atoms_named("H").tolist())
 
         # atom numbers of peptide bond 
         self.peptideBondAtoms = []
 
-        for i in listofC:
-            if listofO.__contains__(i + 1) and listofN.__contains__(i + 2) and listofH.__contains__(i + 3):
+        for i in listofC.tolist():
+            if (i + 1) in setO and (i + 2) in setN and (i + 3) in setH:
                 self.peptideBondAtoms.append([i, i + 1, i + 2, i + 3])
 
+        # atom numbers in the order of the O-C-N-H torsion angle
+        self._peptideBondAtomsArr = np.array(self.peptideBondAtoms, dtype=np.intp).reshape(-1, 4)[:, [1, 0, 2, 3]]
+        self._peptideBondGather = fallback_gather_indices(self._peptideBondAtomsArr)
+        self._has_pb = len(self.peptideBondAtoms) > 0
+
         print '\namberSystem> Peptide bond atom numbers (C,O,N,H, in order):  '
         for i in self.peptideBondAtoms:
             print i
 
     def populate_CAneighborList(self):
-        listofCA = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "CA"]
-        listofC = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "C"]
-        listofN = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "N"]
-        listofCB = [i.index for i in self.potential.prmtop.topology.atoms() if i.name == "CB"]
+        listofCA = self._atoms_named("CA")
+        # which atoms are called C, CB and N, so that the neighbours of a CA can be filtered in O(deg)
+        isC = self._atom_labels == "C"
+        isCB = self._atom_labels == "CB"
+        isN = self._atom_labels == "N"
+
+        # atoms bonded to each atom
+        if not hasattr(self, "_bond_indptr"):
+            self._build_bond_csr()
 
         # atom numbers of peptide bond 
         self.CAneighborList = []
 
-        for i in listofCA:
-            # find atoms bonded to CA 
-            neighborlist = []
-
-            for b in self.potential.prmtop.topology.bonds():
-                #                print b
-                if b[0] == i:
-                    neighborlist.append(b[1])
-                if b[1] == i:
-                    neighborlist.append(b[0])
-                # Commented, since this stuff doesn't seem to work at the moment...
-                #                if self.OpenMMVer == 5 :
-                #                    # openmm5
-                #                    if b[0].index == i:
-                #                        neighborlist.append(b[1].index)
-                #                    if b[1].index == i:
-                #                        neighborlist.append(b[0].index)
-                #                else:   # openmm4
-                #                    if b[0].index == i:
-                #                        neighborlist.append(b[1].index)
-                #                    if b[1].index == i:
-                #                        neighborlist.append(b[0].index)
-
-
-            # print '---bonds = ', b[0].index , b[1].index 
-            # print '---amberSystem> atoms bonded to CA ',i, ' = ', neighborlist    
+        for i in listofCA.tolist():
+            neighborlist = self._bond_indices[self._bond_indptr[i]:self._bond_indptr[i + 1]]
             nn = [i]
-            # append C (=O) 
-            for n in neighborlist:
-                if listofC.__contains__(n):
-                    nn.append(n)
-
-                    # append CB
-            for n in neighborlist:
-                if listofCB.__contains__(n):
-                    nn.append(n)
-
-                    # append N
-            for n in neighborlist:
-                if listofN.__contains__(n):
-                    nn.append(n)
+            # append C (=O)
+            nn += neighborlist[isC[neighborlist]].tolist()
+            # append CB
+            nn += neighborlist[isCB[neighborlist]].tolist()
+            # append N
+            nn += neighborlist[isN[neighborlist]].tolist()
 
             self.CAneighborList.append(nn)
 
             # atoms numbers start at 0
+
+        # atom numbers in the order of the C-CA-CB-N improper torsion angle.
+        # CA atoms without a CB (glycine) are not chiral and are skipped
+        CAneighbors = [nn for nn in self.CAneighborList if len(nn) == 4]
+        self._CAneighborArr = np.array(CAneighbors, dtype=np.intp).reshape(-1, 4)[:, [1, 0, 2, 3]]
+        self._CAneighborGather = fallback_gather_indices(self._CAneighborArr)
+        self._has_ca = len(self._CAneighborArr) > 0
+
         print '\namberSystem> CA neighbors atom numbers (CA,C(=O),CB, N, in order):  '
         for i in self.CAneighborList:
             print i
@@ -478,33 +568,20 @@ class AMBERSystem(BaseSystem):
         if not hasattr(self, "peptideBondAtoms"):
             # atom numbers of peptide bonds       
             self.populate_peptideAtomList()
+        if not self._has_pb:
+            return True
 
-        import measure
-
-        m = measure.Measure()
-
-        isTrans = True
+        # compute all O-C-N-H torsion angles at once
+        deg = torsion_angles_from_indices(coords, self._peptideBondAtomsArr, self._peptideBondGather)
 
-        for i in self.peptideBondAtoms:
-            atNum = i[0]
-            rC = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[1]
-            rO = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[2]
-            rN = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[3]
-            rH = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-
-            # compute O-C-N-H torsion angle 
-            rad, deg = m.torsion(rO, rC, rN, rH)
-
-            # print 'peptide torsion (deg) ', i, ' = ', deg 
-            # check cis 
-            if deg < 90 or deg > 270:
-                isTrans = False
-                print 'CIS peptide bond between atoms ', i, ' torsion (deg) = ', deg
+        return self._check_peptide_torsions(deg)
 
-        return isTrans
+    def _check_peptide_torsions(self, deg):
+        """return True if none of the peptide bond torsion angles deg is cis, reporting those that are"""
+        cis = is_cis(deg)
+        for k in np.where(cis)[0]:
+            print 'CIS peptide bond between atoms ', self.peptideBondAtoms[k], ' torsion (deg) = ', deg[k]
+        return not cis.any()
 
 
     def check_CAchirality_wrapper_kwargs(self, coords=None, **kwargs):
@@ -523,36 +600,55 @@ class AMBERSystem(BaseSystem):
         if not hasattr(self, "CAneighborList"):
             # atom numbers of CA neighbors                
             self.populate_CAneighborList()
+        if not self._has_ca:
+            return True
 
+        # compute all C-CA-CB-N improper torsion angles at once
+        deg = torsion_angles_from_indices(coords, self._CAneighborArr, self._CAneighborGather)
 
-            # print 'in check CA chirality'
-        import measure
+        return self._check_CA_torsions(deg)
 
-        m = measure.Measure()
+    def _check_CA_torsions(self, deg):
+        """return True if none of the CA improper torsion angles deg is of a D-amino acid, reporting those that are"""
+        isD = is_D_chiral(deg)
+        for k in np.where(isD)[0]:
+            print 'chiral state of CA atom ', self._CAneighborArr[k, 1], ' is D'
+            print 'CA improper torsion (deg) ', self._CAneighborArr[k, [1, 0, 2, 3]].tolist(), ' = ', deg[k]
+        return not isD.any()
 
-        isL = True
 
-        for i in self.CAneighborList:
-            atNum = i[0]
-            rCA = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[1]
-            rC = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[2]
-            rCB = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[3]
-            rN = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
+    def check_sanity_wrapper_kwargs(self, coords=None, **kwargs):
+        return all(self.check_sanity(coords))
+
+    def check_sanity_wrapper(self, energy, coords, **kwargs):
+        return all(self.check_sanity(coords))
 
-            # compute improper torsion angle between C-CA-CB and CA-CB-N 
-            rad, deg = m.torsion(rC, rCA, rCB, rN)
+    def check_sanity(self, coords):
+        """ 
+        Sanity check on both the peptide bonds and the chirality of the CA atoms
+
+        This is equivalent to check_cistrans and check_CAchirality, but computes
+        all the torsion angles from a single read of the coordinates.
+
+        Returns (isTrans, isL)
+        """
+        if not hasattr(self, "_sanityAtomsArr"):
+            if not hasattr(self, "peptideBondAtoms"):
+                self.populate_peptideAtomList()
+            if not hasattr(self, "CAneighborList"):
+                self.populate_CAneighborList()
+            self._sanityAtomsArr = np.vstack((self._peptideBondAtomsArr, self._CAneighborArr))
+            self._sanityGather = fallback_gather_indices(self._sanityAtomsArr)
+        if not (self._has_pb or self._has_ca):
+            return True, True
 
-            # check cis 
-            if deg < 180:
-                # this condition was found by inspection of structures todo   
-                isL = False
-                print 'chiral state of CA atom ', i[0], ' is D'
-                print 'CA improper torsion (deg) ', i, ' = ', deg
+        deg = torsion_angles_from_indices(coords, self._sanityAtomsArr, self._sanityGather)
+        npeptide = len(self._peptideBondAtomsArr)
 
-        return isL
+        isTrans = self._check_peptide_torsions(deg[:npeptide])
+        isL = self._check_CA_torsions(deg[npeptide:])
+
+        return isTrans, isL
 
 
     def test_potential(self, pdbfname):
@@ -565,12 +661,8 @@ class AMBERSystem(BaseSystem):
         """
         # read a conformation from pdb file
         print 'reading conformation from coords.pdb'
-        from simtk.openmm.app import pdbfile as openmmpdb
-        from simtk.unit import angstrom as openmm_angstrom
-
         pdb = openmmpdb.PDBFile(pdbfname)
-        coords = pdb.getPositions() / openmm_angstrom
-        coords = np.reshape(np.transpose(coords), 3 * len(coords), 1)
+        coords = np.asarray(pdb.getPositions() / openmm_angstrom, dtype=np.float64).reshape(-1)
 
         self.potential = self.get_potential()
 
@@ -628,12 +720,10 @@ class AMBERSystem(BaseSystem):
         min0 = db.minima()[0]
         print "lowest minimum found has energy = ", min0.energy
 
-    def test_BH(self, db, nsteps):
+    def test_BH(self, db, nsteps, coords=None):
 
         self.potential = self.get_potential()
 
-        from pele.takestep import RandomDisplacement, AdaptiveStepsizeTemperature
-
         takeStepRnd = RandomDisplacement(stepsize=2)
         tsAdaptive = AdaptiveStepsizeTemperature(takeStepRnd, interval=10, verbose=True)
 
@@ -641,8 +731,8 @@ class AMBERSystem(BaseSystem):
 
         # todo - how do you save N lowest?    
 
-        bh = self.get_basinhopping(database=db, takestep=takeStepRnd)
-        bh = self.get_basinhopping(database=db, takestep=tsAdaptive)
+        bh = self.get_basinhopping(database=db, takestep=takeStepRnd, coords=coords)
+        bh = self.get_basinhopping(database=db, takestep=tsAdaptive, coords=coords)
 
         print 'Running BH .. '
         bh.run(nsteps)
@@ -651,6 +741,44 @@ class AMBERSystem(BaseSystem):
         min0 = db.minima()[0]
         print "lowest minimum found has energy = ", min0.energy
 
+    def test_BH_parallel(self, db, nsteps, nworkers=None):
+        """run independent basinhopping chains in parallel and collect the minima in db
+
+        Each worker process sets up its own system and potential (the OpenMM
+        objects can't be pickled), starts from the inpcrd structure displaced
+        randomly with its own random seed and runs its share of the nsteps
+        steps of :meth:`test_BH` with an in-memory database.  The minima found
+        by the workers are then added to db in this process, so the duplicate
+        check of db is not raced by the workers.
+        """
+        if nworkers is None:
+            nworkers = mp.cpu_count()
+        if nsteps < nworkers:
+            raise ValueError("test_BH_parallel needs at least one step per worker (nsteps=%d, nworkers=%d)"
+                             % (nsteps, nworkers))
+
+        # spread the remainder over the first workers
+        steps = [nsteps // nworkers + (1 if i < nsteps % nworkers else 0) for i in xrange(nworkers)]
+        seeds = np.random.randint(0, 2 ** 31 - 1, size=nworkers)
+        jobs = [(self.__class__, self.prmtopFname, self.inpcrdFname, self.platform, n, seed)
+                for n, seed in zip(steps, seeds)]
+
+        print 'Running BH with %d workers .. ' % nworkers
+        pool = mp.Pool(nworkers)
+        try:
+            results = pool.map(_run_BH_worker, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+        for minima in results:
+            for energy, coords in minima:
+                db.addMinimum(energy, coords)
+
+        print "Number of minima found = ", len(db.minima())
+        min0 = db.minima()[0]
+        print "lowest minimum found has energy = ", min0.energy
+
 
     def test_mindist(self, db):
         m1, m2 = db.minima()[:2]
@@ -659,6 +787,24 @@ class AMBERSystem(BaseSystem):
         print "distance", dist
 
 
+def _run_BH_worker(job):
+    """run one basinhopping chain of AMBERSystem.test_BH_parallel in a worker process
+
+    returns the list of (energy, coords) of the minima found
+    """
+    system_class, prmtopFname, inpcrdFname, platform, nsteps, seed = job
+    np.random.seed(seed)
+    system = system_class(prmtopFname, inpcrdFname, platform=platform)
+
+    # start each chain from a different structure
+    coords = system.get_random_configuration()
+    RandomDisplacement(stepsize=system.params.takestep_random_displacement.stepsize).takeStep(coords)
+
+    db = system.create_database()
+    system.test_BH(db, nsteps, coords=coords)
+    return [(m.energy, m.coords) for m in db.minima()]
+
+
 class AmberSpawnOPTIM(SpawnOPTIM):
     def __init__(self, coords1, coords2, sys, **kwargs):
         super(AmberSpawnOPTIM, self).__init__(coords1, coords2, **kwargs)
@@ -674,9 +820,7 @@ class AmberSpawnOPTIM(SpawnOPTIM):
 
     def write_additional_input_files(self, rundir, coords1, coords2):
         # write start
-        with open(rundir + "/start", "w") as fout:
-            for xyz in coords1.reshape(-1, 3):
-                fout.write("%f %f %f\n" % tuple(xyz))
+        np.savetxt(rundir + "/start", coords1.reshape(-1, 3), fmt="%f %f %f")
 
         # write coords.prmtop and coords.inpcrd
         shutil.copyfile(self.sys.prmtopFname, rundir + "/coords.prmtop")
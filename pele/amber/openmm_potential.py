@@ -18,15 +18,33 @@ from pele.potentials import BasePotential
 
 __all__ = ["OpenMMAmberPotential"]
 
+# OpenMM platforms in order of decreasing speed
+_fastest_platforms = ["CUDA", "OpenCL", "CPU", "Reference"]
+
+# name of the property setting the floating point precision of a platform
+_precision_properties = {"CUDA": "CudaPrecision", "OpenCL": "OpenCLPrecision"}
+
 
 class OpenMMAmberPotential(BasePotential):
     """ 
     OpenMM  
     
     V(r) = Amber 
+
+    Parameters
+    ----------
+    prmtopFname, inpcrdFname : str
+        the amber topology and coordinates files
+    platform : str, optional
+        the OpenMM platform to compute the energy on, e.g. 'CUDA', 'OpenCL',
+        'CPU' or 'Reference'.  If 'fastest' the first of these that can be
+        set up is used.  If None the platform is chosen by OpenMM.
+    precision : str, optional
+        the precision ('single', 'mixed' or 'double') used on the CUDA and
+        OpenCL platforms
     """
 
-    def __init__(self, prmtopFname, inpcrdFname):  # prmtopFname, inpcrdFname ):
+    def __init__(self, prmtopFname, inpcrdFname, platform="fastest", precision="mixed"):
 
         self.prmtop = AmberPrmtopFile(prmtopFname)
         self.inpcrd = AmberInpcrdFile(inpcrdFname)
@@ -35,8 +53,7 @@ class OpenMMAmberPotential(BasePotential):
 
         # todo: set up ff and simulation object  
         self.system = self.prmtop.createSystem(nonbondedMethod=openmmff.NoCutoff)  # no cutoff
-        self.integrator = VerletIntegrator(0.001 * picosecond)
-        self.simulation = Simulation(self.prmtop.topology, self.system, self.integrator)
+        self._setup_simulation(platform, precision)
 
         # Another way of setting up potential using just pdb file ( no prmtop )
         # pdb = PDBFile('coords.pdb')
@@ -50,6 +67,59 @@ class OpenMMAmberPotential(BasePotential):
         self.localCoords = self.inpcrd.positions / angstrom
         self.kJtokCal = kilocalories_per_mole / kilojoules_per_mole
 
+    def _setup_simulation(self, platform, precision):
+        """create the simulation object on the requested OpenMM platform"""
+        if platform is None:
+            self.integrator = VerletIntegrator(0.001 * picosecond)
+            self.simulation = Simulation(self.prmtop.topology, self.system, self.integrator)
+            return
+
+        if platform == "fastest":
+            names = _fastest_platforms
+        else:
+            names = [platform]
+
+        lasterr = None
+        for name in names:
+            try:
+                self._setup_platform(name, precision)
+            except Exception as err:
+                # the platform is not available or could not be initialised
+                if platform != "fastest":
+                    raise
+                print "OpenMMAmberPotential> skipping OpenMM platform", name + ":", err
+                lasterr = err
+                continue
+            print "OpenMMAmberPotential> using OpenMM platform", name
+            return
+
+        raise RuntimeError("could not set up any of the OpenMM platforms %s, last error: %s" % (names, lasterr))
+
+    def _setup_platform(self, name, precision):
+        """create the simulation object on the OpenMM platform called name
+
+        If the platform rejects the precision property (e.g. older versions of
+        OpenMM) it is tried once more with its default precision.
+        """
+        ommplatform = Platform.getPlatformByName(name)
+        properties = dict()
+        if name in _precision_properties:
+            properties[_precision_properties[name]] = precision
+        try:
+            self._create_simulation(ommplatform, properties)
+        except Exception as err:
+            if not properties:
+                raise
+            print "OpenMMAmberPotential> OpenMM platform", name, "failed with", properties, "(%s)," % err, \
+                "retrying with the default precision"
+            self._create_simulation(ommplatform, dict())
+
+    def _create_simulation(self, ommplatform, properties):
+        # an integrator can only be bound to one context, so make a new one for each attempt
+        self.integrator = VerletIntegrator(0.001 * picosecond)
+        self.simulation = Simulation(self.prmtop.topology, self.system, self.integrator,
+                                     ommplatform, properties)
+
     # '''  ------------------------------------------------------------------- '''
     def copyToLocalCoords(self, coords):
         """ copy to local coords -- deprecated  """
@@ -109,8 +179,7 @@ if __name__ == "__main__":
 
     pdb = openmmpdb.PDBFile('../../examples/amber/aladipep/coords.pdb')
 
-    coords = pdb.getPositions() / angstrom
-    coords = numpy.reshape(numpy.transpose(coords), 3 * len(coords), 1)
+    coords = numpy.asarray(pdb.getPositions() / angstrom, dtype=numpy.float64).reshape(-1)
 
     # compute energy and gradients       
     e = pot.getEnergy(coords)
@@ -11,6 +11,8 @@ top   : open mm topology object created from prmtop file as
 
 import numpy as np
 
+from torsions import torsion_angles_from_indices, is_cis, is_D_chiral
+
 __all__ = ["sanity_check"]
 
 
@@ -24,10 +26,6 @@ class sanity_check():
         print 'in sanity check init'
         self.topology = top
 
-        import measure
-
-        self.measure = measure.Measure()
-
         self.populate_CAneighborList()
         self.populate_peptideAtomList()
 
@@ -58,10 +56,17 @@ class sanity_check():
         # atom numbers of peptide bond 
         self.peptideBondAtoms = []
 
+        setO = set(listofO)
+        setN = set(listofN)
+        setH = set(listofH)
+
         for i in listofC:
-            if listofO.__contains__(i + 1) and listofN.__contains__(i + 2) and listofH.__contains__(i + 3):
+            if (i + 1) in setO and (i + 2) in setN and (i + 3) in setH:
                 self.peptideBondAtoms.append([i, i + 1, i + 2, i + 3])
 
+        # atom numbers in the order of the O-C-N-H torsion angle
+        self._peptideBondAtomsArr = np.array(self.peptideBondAtoms, dtype=np.intp).reshape(-1, 4)[:, [1, 0, 2, 3]]
+
         print '\nPeptide bond atom numbers (C,O,N,H, in order):  '
         for i in self.peptideBondAtoms:
             print i
@@ -93,6 +98,10 @@ class sanity_check():
         # atom numbers of peptide bond 
         self.CAneighborList = []
 
+        setC = set(listofC)
+        setCB = set(listofCB)
+        setN = set(listofN)
+
         for i in listofCA:
             # find atoms bonded to CA 
             neighborlist = []
@@ -106,22 +115,28 @@ class sanity_check():
             nn = [i]
             # append C (=O) 
             for n in neighborlist:
-                if listofC.__contains__(n):
+                if n in setC:
                     nn.append(n)
 
                     # append CB
             for n in neighborlist:
-                if listofCB.__contains__(n):
+                if n in setCB:
                     nn.append(n)
 
                     # append N
             for n in neighborlist:
-                if listofN.__contains__(n):
+                if n in setN:
                     nn.append(n)
 
             self.CAneighborList.append(nn)
 
             # atoms numbers start at 0
+
+        # atom numbers in the order of the C-CA-CB-N improper torsion angle.
+        # CA atoms without a CB (glycine) are not chiral and are skipped
+        CAneighbors = [nn for nn in self.CAneighborList if len(nn) == 4]
+        self._CAneighborArr = np.array(CAneighbors, dtype=np.intp).reshape(-1, 4)[:, [1, 0, 2, 3]]
+
         print '\nCA neighbors atom numbers (CA,C(=O),CB, N, in order):  '
         for i in self.CAneighborList:
             print i
@@ -134,26 +149,11 @@ class sanity_check():
         
         """
 
-        isTrans = True
+        # compute all O-C-N-H torsion angles at once
+        deg = torsion_angles_from_indices(coords, self._peptideBondAtomsArr)
 
-        for i in self.peptideBondAtoms:
-            atNum = i[0]
-            rC = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[1]
-            rO = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[2]
-            rN = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[3]
-            rH = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-
-            # compute O-C-N-H torsion angle 
-            rad, deg = self.measure.torsion(rO, rC, rN, rH)
-
-            # print 'peptide torsion (deg) ', i, ' = ', deg 
-            # check cis 
-            if deg < 90 or deg > 270:
-                isTrans = False
-            # print 'CIS peptide bond between atoms ', i, ' torsion (deg) = ', deg
+        # check cis
+        isTrans = not is_cis(deg).any()
 
         return isTrans
 
@@ -167,27 +167,10 @@ class sanity_check():
 
         # print 'in check CA chirality'
 
-        isL = True
+        # compute all C-CA-CB-N improper torsion angles at once
+        deg = torsion_angles_from_indices(coords, self._CAneighborArr)
 
-        for i in self.CAneighborList:
-            atNum = i[0]
-            rCA = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[1]
-            rC = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[2]
-            rCB = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-            atNum = i[3]
-            rN = np.array([coords[3 * atNum], coords[3 * atNum + 1], coords[3 * atNum + 2]])
-
-            # compute improper torsion angle between C-CA-CB and CA-CB-N 
-            rad, deg = self.measure.torsion(rC, rCA, rCB, rN)
-
-            # check cis 
-            if deg < 180:
-                # this condition was found by inspection of structures todo   
-                isL = False
-            # print 'chiral state of CA atom ', i[0], ' is D'
-            # print 'CA improper torsion (deg) ', i, ' = ', deg
+        isL = not is_D_chiral(deg).any()
 
         return isL
 
@@ -207,8 +190,7 @@ if __name__ == "__main__":
 
     pdb = openmmpdbReader.PDBFile('../../examples/amber/coords.pdb')  # todo: coords.pdb is hardcoded 
 
-    coords = pdb.getPositions() / openmm_angstrom
-    coords = np.reshape(np.transpose(coords), 3 * len(coords), 1)
+    coords = np.asarray(pdb.getPositions() / openmm_angstrom, dtype=np.float64).reshape(-1)
 
     # test 
     if scheck.check_CAchirality(coords):
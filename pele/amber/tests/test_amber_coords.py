@@ -0,0 +1,44 @@
+import unittest
+import tempfile
+
+import numpy as np
+
+from pele.amber.amberSystem import AMBERSystem
+
+
+_xyz = np.array([[1.5, -2.25, 3.125],
+                 [4., 5.5, -6.75],
+                 [-7., 8.25, 9.5]])
+
+
+def _write_inpcrd(fout, xyz):
+    """write the coordinates xyz in the amber inpcrd format"""
+    fout.write("test molecule\n")
+    fout.write("%6d\n" % len(xyz))
+    flat = xyz.ravel()
+    for i in xrange(0, len(flat), 6):
+        fout.write("".join("%12.7f" % x for x in flat[i:i + 6]) + "\n")
+    fout.flush()
+
+
+class TestRandomConfiguration(unittest.TestCase):
+    def setUp(self):
+        self.inpcrd = tempfile.NamedTemporaryFile(mode="w", suffix=".inpcrd")
+        _write_inpcrd(self.inpcrd, _xyz)
+        # only the inpcrd file is needed, so skip parsing a prmtop
+        self.system = AMBERSystem.__new__(AMBERSystem)
+        self.system.inpcrdFname = self.inpcrd.name
+
+    def tearDown(self):
+        self.inpcrd.close()
+
+    def test_atom_order(self):
+        coords = self.system.get_random_configuration()
+        self.assertEqual(coords.shape, (3 * len(_xyz),))
+        self.assertEqual(coords.dtype, np.float64)
+        for i, xyz in enumerate(_xyz):
+            self.assertTrue(np.allclose(coords[3 * i:3 * i + 3], xyz))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from pele.amber.amberSystem import AMBERSystem
+
+
+# an alanine followed by a glycine.  The CA of glycine has no CB
+_labels = ["N", "H", "CA", "CB", "C", "O", "N", "H", "CA", "C", "O"]
+_elements = ["N", "H", "C", "C", "C", "O", "N", "H", "C", "C", "O"]
+_bonds = [(0, 1), (2, 0), (2, 3), (4, 2), (4, 5), (4, 6), (6, 7), (6, 8), (8, 9), (9, 10)]
+
+
+class TestSanityAtomLists(unittest.TestCase):
+    def setUp(self):
+        # the atom lists only need the topology, so skip parsing a prmtop
+        self.system = AMBERSystem.__new__(AMBERSystem)
+        self.system.atom_names = _elements
+        self.system.bonds = _bonds
+        self.system._atom_labels = np.array(_labels)
+        self.system._bond_arr = np.array(_bonds, dtype=np.intp)
+
+    def test_peptide_bonds(self):
+        self.system.populate_peptideAtomList()
+        self.assertEqual(self.system.peptideBondAtoms, [[4, 5, 6, 7]])
+        # O-C-N-H order
+        self.assertEqual(self.system._peptideBondAtomsArr.tolist(), [[5, 4, 6, 7]])
+        self.assertTrue(self.system._has_pb)
+
+    def test_CA_neighbors(self):
+        self.system.populate_CAneighborList()
+        # CA, C, CB, N order whatever the order of the bonds
+        self.assertEqual(self.system.CAneighborList, [[2, 4, 3, 0], [8, 9, 6]])
+        # C-CA-CB-N order, without the glycine
+        self.assertEqual(self.system._CAneighborArr.tolist(), [[4, 2, 3, 0]])
+        self.assertTrue(self.system._has_ca)
+
+
+if __name__ == "__main__":
+    unittest.main()
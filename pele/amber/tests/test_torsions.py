@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+
+from pele.amber import torsions
+from pele.amber.torsions import (torsion_angles, torsion_angles_from_indices, coordinate_indices,
+                                 fallback_gather_indices, is_cis, is_D_chiral)
+
+
+def _measure_torsion(r1, r2, r3, r4):
+    """reference torsion angle in degrees, computed as in Measure.torsion"""
+    normal1 = np.cross(r2 - r1, r3 - r2)
+    normal1 /= np.linalg.norm(normal1)
+    normal2 = np.cross(r3 - r2, r4 - r3)
+    normal2 /= np.linalg.norm(normal2)
+    costheta = np.clip(np.dot(normal1, normal2), -1., 1.)
+    anchor = (r3 - r2) / np.linalg.norm(r3 - r2)
+    if np.dot(anchor, np.cross(normal1, normal2)) < 0:
+        return np.degrees(2 * np.pi - np.arccos(costheta))
+    return np.degrees(np.arccos(costheta))
+
+
+def _dihedral(r4):
+    """four points with the first three fixed and the last one given"""
+    return np.array([[1., 0., 0.], [0., 0., 0.], [0., 1., 0.], r4])
+
+
+class TestTorsionAngles(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.natoms = 20
+        self.coords = np.random.uniform(-2., 2., 3 * self.natoms)
+        self.idx4 = np.array([np.random.permutation(self.natoms)[:4] for _ in xrange(50)], dtype=np.intp)
+
+    def assert_angles_equal(self, deg1, deg2):
+        # angles close to 0 and 360 are the same
+        diff = (np.asarray(deg1) - np.asarray(deg2) + 180.) % 360. - 180.
+        self.assertTrue(np.all(np.abs(diff) < 1e-6), diff)
+
+    def test_known(self):
+        p = np.array([_dihedral([1., 1., 0.]),  # cis
+                      _dihedral([-1., 1., 0.]),  # trans
+                      _dihedral([0., 1., -1.]),
+                      _dihedral([0., 1., 1.])])
+        self.assert_angles_equal(torsion_angles(p), [0., 180., 90., 270.])
+
+    def test_range(self):
+        deg = torsion_angles(self.coords.reshape(-1, 3)[self.idx4])
+        self.assertTrue(np.all(deg >= 0.))
+        self.assertTrue(np.all(deg < 360.))
+
+    def test_measure_convention(self):
+        xyz = self.coords.reshape(-1, 3)
+        deg = torsion_angles(xyz[self.idx4])
+        ref = [_measure_torsion(*xyz[i]) for i in self.idx4]
+        self.assert_angles_equal(deg, ref)
+
+    def test_coordinate_indices(self):
+        gather = coordinate_indices(self.idx4)
+        p = self.coords.take(gather).reshape(-1, 4, 3)
+        self.assertTrue(np.all(p == self.coords.reshape(-1, 3)[self.idx4]))
+
+    def test_from_indices(self):
+        deg = torsion_angles_from_indices(self.coords, self.idx4)
+        self.assert_angles_equal(deg, torsion_angles(self.coords.reshape(-1, 3)[self.idx4]))
+
+    def test_from_indices_gather(self):
+        gather = fallback_gather_indices(self.idx4)
+        if torsions.numba is None:
+            self.assertTrue(np.all(gather == coordinate_indices(self.idx4)))
+        else:
+            self.assertIsNone(gather)
+        deg = torsion_angles_from_indices(self.coords, self.idx4, gather)
+        self.assert_angles_equal(deg, torsion_angles(self.coords.reshape(-1, 3)[self.idx4]))
+
+    def test_numba_matches_numpy(self):
+        if torsions.numba is None:
+            self.skipTest("numba is not installed")
+        deg = torsions._torsion_angles_from_indices_jit(self.coords, self.idx4)
+        self.assert_angles_equal(deg, torsion_angles(self.coords.reshape(-1, 3)[self.idx4]))
+
+    def test_empty(self):
+        idx4 = np.zeros((0, 4), dtype=np.intp)
+        self.assertEqual(torsion_angles(np.zeros((0, 4, 3))).shape, (0,))
+        self.assertEqual(coordinate_indices(idx4).shape, (0,))
+        self.assertEqual(torsion_angles_from_indices(self.coords, idx4).shape, (0,))
+
+
+class TestSanityThresholds(unittest.TestCase):
+    def test_cis(self):
+        deg = np.array([0., 45., 100., 180., 260., 300., 359.])
+        self.assertEqual(is_cis(deg).tolist(), [True, True, False, False, False, True, True])
+
+    def test_D_chiral(self):
+        deg = np.array([10., 179., 181., 350.])
+        self.assertEqual(is_D_chiral(deg).tolist(), [True, True, False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
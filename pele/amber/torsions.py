@@ -0,0 +1,160 @@
+"""
+Vectorized torsion angles for the sanity checks on biomolecules
+
+The angles follow the same convention as :meth:`pele.amber.measure.Measure.torsion`,
+i.e. they are returned in degrees between 0 and 360.
+"""
+import math
+
+import numpy as np
+
+__all__ = ["torsion_angles", "torsion_angles_from_indices", "coordinate_indices",
+           "fallback_gather_indices", "is_cis", "is_D_chiral"]
+
+
+def torsion_angles(p):
+    """compute the torsion angles of many sets of four points at once
+
+    Parameters
+    ----------
+    p : array, shape (N, 4, 3)
+        the Cartesian coordinates of the four points r1, r2, r3, r4
+        defining each torsion angle
+
+    Returns
+    -------
+    deg : array, shape (N,)
+        the torsion angles in degrees, between 0 and 360
+    """
+    p = np.asarray(p, dtype=float)
+    b1 = p[:, 1] - p[:, 0]
+    b2 = p[:, 2] - p[:, 1]
+    b3 = p[:, 3] - p[:, 2]
+
+    # normals to the planes 1-2-3 and 2-3-4
+    n1 = np.cross(b1, b2)
+    n2 = np.cross(b2, b3)
+
+    # the sign of the angle is given by whether the cross product of the
+    # normals is parallel or antiparallel to the vector r3-r2
+    anchor = b2 / np.sqrt((b2 * b2).sum(-1))[:, np.newaxis]
+    x = (n1 * n2).sum(-1)
+    y = (np.cross(n1, n2) * anchor).sum(-1)
+
+    return np.degrees(np.arctan2(y, x)) % 360.
+
+
+def coordinate_indices(idx4):
+    """return the indices into the flat coordinate array of the atoms idx4
+
+    Parameters
+    ----------
+    idx4 : integer array, shape (N, 4)
+        atom numbers
+
+    Returns
+    -------
+    gather : integer array, shape (12*N,)
+        the indices such that coords.take(gather).reshape(-1, 4, 3) are the
+        Cartesian coordinates of the atoms idx4
+    """
+    idx4 = np.asarray(idx4, dtype=np.intp)
+    return np.ascontiguousarray((3 * idx4[:, :, np.newaxis] + np.arange(3, dtype=np.intp)).ravel())
+
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True)
+    def _torsion_angles_from_indices_jit(coords, idx4):
+        deg = np.empty(idx4.shape[0])
+        for k in range(idx4.shape[0]):
+            i1 = 3 * idx4[k, 0]
+            i2 = 3 * idx4[k, 1]
+            i3 = 3 * idx4[k, 2]
+            i4 = 3 * idx4[k, 3]
+            b1x = coords[i2] - coords[i1]
+            b1y = coords[i2 + 1] - coords[i1 + 1]
+            b1z = coords[i2 + 2] - coords[i1 + 2]
+            b2x = coords[i3] - coords[i2]
+            b2y = coords[i3 + 1] - coords[i2 + 1]
+            b2z = coords[i3 + 2] - coords[i2 + 2]
+            b3x = coords[i4] - coords[i3]
+            b3y = coords[i4 + 1] - coords[i3 + 1]
+            b3z = coords[i4 + 2] - coords[i3 + 2]
+
+            # normals to the planes 1-2-3 and 2-3-4
+            n1x = b1y * b2z - b1z * b2y
+            n1y = b1z * b2x - b1x * b2z
+            n1z = b1x * b2y - b1y * b2x
+            n2x = b2y * b3z - b2z * b3y
+            n2y = b2z * b3x - b2x * b3z
+            n2z = b2x * b3y - b2y * b3x
+
+            # (n1 x n2) . b2 / |b2|
+            b2norm = math.sqrt(b2x * b2x + b2y * b2y + b2z * b2z)
+            y = ((n1y * n2z - n1z * n2y) * b2x
+                 + (n1z * n2x - n1x * n2z) * b2y
+                 + (n1x * n2y - n1y * n2x) * b2z) / b2norm
+            x = n1x * n2x + n1y * n2y + n1z * n2z
+
+            deg[k] = math.degrees(math.atan2(y, x)) % 360.
+        return deg
+
+
+def fallback_gather_indices(idx4):
+    """return the gather argument of :func:`torsion_angles_from_indices` for idx4
+
+    This is coordinate_indices(idx4) if the NumPy fallback is used and None
+    if numba is available, because the compiled kernel does not need it.
+    """
+    if numba is None:
+        return coordinate_indices(idx4)
+    return None
+
+
+def torsion_angles_from_indices(coords, idx4, gather=None):
+    """compute the torsion angles between the atoms idx4 of coords
+
+    A compiled numba kernel that indexes coords directly is used if numba is
+    available.  Otherwise the coordinates of the atoms are gathered with a
+    single coords.take (see :func:`coordinate_indices`) and passed to
+    :func:`torsion_angles`.
+
+    Parameters
+    ----------
+    coords : array, shape (3*natoms,)
+        the flat array of Cartesian coordinates
+    idx4 : integer array, shape (N, 4)
+        the atom numbers defining each torsion angle
+    gather : integer array, optional
+        the result of coordinate_indices(idx4), used by the NumPy fallback.
+        Pass it (see :func:`fallback_gather_indices`) if the same idx4 is
+        used many times to save recomputing it.
+
+    Returns
+    -------
+    deg : array, shape (N,)
+        the torsion angles in degrees, between 0 and 360
+    """
+    if numba is None:
+        if gather is None:
+            gather = coordinate_indices(idx4)
+        p = np.asarray(coords).take(gather).reshape(-1, 4, 3)
+        return torsion_angles(p)
+    return _torsion_angles_from_indices_jit(np.ascontiguousarray(coords, dtype=np.float64), idx4)
+
+
+def is_cis(deg):
+    """return which of the O-C-N-H peptide bond torsion angles deg (in degrees) are cis"""
+    deg = np.asarray(deg)
+    return (deg < 90) | (deg > 270)
+
+
+def is_D_chiral(deg):
+    """return which of the C-CA-CB-N improper torsion angles deg (in degrees) are of D-amino acids"""
+    # this condition was found by inspection of structures todo
+    return np.asarray(deg) < 180